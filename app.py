@@ -3,13 +3,18 @@ FastAPI Interface for PyTerrier Search Engine
 This script provides a RESTful API using FastAPI for the search engine.
 """
 
+import asyncio
+import logging
 import os
+import threading
+import anyio.to_thread
 import pandas as pd
 import pyterrier as pt
 import uvicorn
 from typing import Dict, Any
-from fastapi import FastAPI, HTTPException, Query
-from fastapi.responses import HTMLResponse
+from cachetools import TTLCache
+from fastapi import FastAPI, HTTPException, Query, Response
+from fastapi.responses import HTMLResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
@@ -27,11 +32,14 @@ from index import SearchEngine
 from qac import QueryAutoCompletion
 from schema import *
 
+logger = logging.getLogger(__name__)
+
 # Initialize FastAPI app
 app = FastAPI(
     title="PyTerrier Search API",
     description="A RESTful API for searching documents using PyTerrier",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
 )
 
 origins = [
@@ -69,41 +77,188 @@ os.makedirs("static", exist_ok=True)
 # Create templates
 templates = Jinja2Templates(directory="templates")
 
+# Serve static assets through Starlette's sendfile fast-path
+app.mount("/static", StaticFiles(directory="static"), name="static")
+
 # Global search engine instance
 search_engine = None
 
 
+class SearchBatcher:
+    """
+    Micro-batches concurrent search queries into one BatchRetrieve.transform.
+
+    Each transform call crosses the Py4J/JVM boundary; queries arriving
+    within a short window are collected into a single multi-qid DataFrame
+    and the ranked slices are handed back to each waiting caller.
+    """
+
+    def __init__(self, max_batch=16, max_wait_ms=5):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue = None
+        self._worker_task = None
+
+    def start(self):
+        """Create the queue and worker task on the running event loop."""
+        self.queue = asyncio.Queue()
+        self._worker_task = asyncio.create_task(self._worker())
+
+    async def submit(self, query, num_results):
+        """Queue a query and wait for its ranked result slice."""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((query, num_results, future))
+        return await future
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                # One transform and one metadata fetch for the whole batch;
+                # a pooled connection is warmed concurrently with the JVM
+                # work so the fetch checks out an open socket
+                queries = [item[0] for item in batch]
+                max_results = max(item[1] for item in batch)
+                per_query, _ = await asyncio.gather(
+                    asyncio.to_thread(search_engine.batch_search, queries, max_results, db),
+                    asyncio.to_thread(_warm_db_connection),
+                )
+                for (_, num_results, future), rows in zip(batch, per_query):
+                    if not future.done():
+                        future.set_result(rows[:num_results])
+            except Exception as exc:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+
+
+def _warm_db_connection():
+    """Check a pooled connection out and back so it is open and pinged."""
+    with db.connect():
+        pass
+
+
+search_batcher = SearchBatcher()
+
+# Repeated queries and typeahead prefixes are highly cacheable; both
+# caches are per-worker and cleared when the index or model changes.
+# search_cache is only touched from the event loop; suggest_cache is
+# mutated from the anyio threadpool (get_suggestions is sync) and
+# TTLCache is not thread-safe, so it needs a lock
+search_cache = TTLCache(maxsize=2_000, ttl=300)
+suggest_cache = TTLCache(maxsize=10_000, ttl=300)
+suggest_lock = threading.Lock()
+
+# Documents posted to /api/add_document are buffered and flushed to the
+# index in batches instead of rebuilding per document
+pending_documents = []
+pending_lock = threading.Lock()
+FLUSH_MAX_DOCS = 1000
+FLUSH_INTERVAL_SECONDS = 30.0
+
+
+async def flush_pending_documents():
+    """Index whatever is buffered and invalidate the search cache.
+
+    On failure the batch is put back at the front of the buffer so
+    accepted documents are retried on the next flush, not dropped.
+    """
+    with pending_lock:
+        batch = list(pending_documents)
+        pending_documents.clear()
+    if batch:
+        try:
+            await asyncio.to_thread(search_engine.index_documents, batch)
+        except Exception:
+            with pending_lock:
+                pending_documents[:0] = batch
+            raise
+        search_cache.clear()
+
+
+async def _pending_flush_loop():
+    while True:
+        await asyncio.sleep(FLUSH_INTERVAL_SECONDS)
+        try:
+            await flush_pending_documents()
+        except Exception:
+            # Keep the loop alive; the re-queued batch is retried next tick
+            logger.exception("Periodic document flush failed")
+
+# Homepage HTML, read from disk once at startup so `home` never touches the
+# filesystem on the request path. Falls back to a stub when no template
+# has been shipped so the API still boots.
+_INDEX_HTML: bytes = b"<html><body><h1>Job Search API</h1><p>See /docs for the API reference.</p></body></html>"
+
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize the search engine when the app starts."""
     global search_engine
     global qac
     global db
-    search_engine = SearchEngine()
-    search_engine.load_index()
-    search_engine.set_retrieval_model("BM25")
-    
-    qac = QueryAutoCompletion()
-    qac.load_model("qac.pkl")
-    
-    # Connect db
+    global _INDEX_HTML
+
+    # Sync endpoints run on the anyio threadpool; raise the default limit
+    # (40) so concurrent search/DB work does not queue behind it.
+    anyio.to_thread.current_default_thread_limiter().total_tokens = 128
+
+    if os.path.exists("templates/index.html"):
+        with open("templates/index.html", "rb") as f:
+            _INDEX_HTML = f.read()
+    else:
+        logger.warning("templates/index.html not found; serving fallback homepage")
+
+    # Connect db first so the pooled engine can be shared with the
+    # search engine for its lifetime
     db = create_engine(
         connection_string,
+        pool_size=20,
+        max_overflow=40,
+        pool_pre_ping=True,
+        pool_recycle=300,
         connect_args={
             'connect_timeout': 30,  # Longer timeout
-            'application_name': 'job_listings'  # Help identify this connection in logs
+            'application_name': 'job_listings',  # Help identify this connection in logs
+            'keepalives': 1,
+            'keepalives_idle': 30,
         }
     )
 
+    search_engine = SearchEngine(engine=db)
+    search_engine.load_index()
+    search_engine.set_retrieval_model("BM25")
+
+    # Warm the mmap'd index: fault lexicon/posting pages in before the
+    # first real request hits this worker
+    search_engine.search("software engineer", num_results=1)
+
+
+    qac = QueryAutoCompletion()
+    qac.load_model("qac.pkl")
+
+    search_batcher.start()
+    asyncio.create_task(_pending_flush_loop())
+
 
 @app.get("/", response_class=HTMLResponse)
 async def home():
-    """Serve the search engine homepage."""
-    with open("templates/index.html", "r") as f:
-        return f.read()
+    """Serve the search engine homepage from the in-memory copy."""
+    return HTMLResponse(content=_INDEX_HTML)
 
-@app.get("/api/search", response_model=SearchResponse)
-async def search(query: SearchQuery = Query(None)):
+@app.post("/api/search", response_model=SearchResponse)
+async def search(query: SearchQuery):
     """
     Search API endpoint
     
@@ -115,21 +270,22 @@ async def search(query: SearchQuery = Query(None)):
     """
     if not search_engine:
         raise HTTPException(status_code=500, detail="Search engine not initialized")
-    
-    # Perform search
-    results = search_engine.search(
-        query.query, 
-        num_results=query.num_results, 
-        engine=db
-    )
+
+    cache_key = (query.query, query.num_results)
+    results = search_cache.get(cache_key)
+    if results is None:
+        # The micro-batcher folds concurrent queries into a single
+        # batch_search (one JVM crossing plus one DB fetch per batch)
+        results = await search_batcher.submit(query.query, query.num_results)
+        search_cache[cache_key] = results
     
     # Convert to response model
     response = {"results": results}
-    print(f">>>>> Response: {response}")    
+    logger.debug("search response=%s", response)
     return response
 
 @app.get("/api/jobs", response_model=SearchResponse)
-async def get_jobs():
+def get_jobs():
     if not search_engine:
         raise HTTPException(status_code=500, detail="Search engine not initialized")
     
@@ -138,11 +294,11 @@ async def get_jobs():
     
     # Convert to response model
     response = {"results": results}
-    print(f">>>>> Response: {response}")    
+    logger.debug("jobs response=%s", response)
     return response
 
 @app.get("/api/jobs/{id}", response_model=SearchDetail)
-async def get_details(id: str):
+def get_details(id: str):
     
     """
     Get jobs details
@@ -161,18 +317,24 @@ async def get_details(id: str):
         doc_id=id,
         engine=db
     )
-    print(f">>>>> Response: {result}")    
+    logger.debug("details response=%s", result)
     return result
 
 @app.get("/api/suggest", response_model=QuerySuggestionResponse)
-async def get_suggestions(query: SearchQuery = Query(None)):
+def get_suggestions(response: Response, query: SearchQuery = Query(None)):
     """
     Get query suggestions while typing
-    
+
     Args:
         query: string -> as query params
     """
-    results = qac.get_suggestions(query.query)
+    with suggest_lock:
+        results = suggest_cache.get(query.query)
+    if results is None:
+        results = qac.get_suggestions(query.query)
+        with suggest_lock:
+            suggest_cache[query.query] = results
+    response.headers["Cache-Control"] = "public, max-age=60"
     return {"results": results}
 
 @app.get("/health")
@@ -199,7 +361,8 @@ async def set_model(config: ModelConfig):
         raise HTTPException(status_code=400, detail=f"Invalid model. Choose from: {', '.join(valid_models)}")
     
     search_engine.set_retrieval_model(config.model)
-    
+    search_cache.clear()
+
     return {"status": "success", "message": f"Model changed to {config.model}"}
 
 
@@ -221,38 +384,55 @@ async def get_info():
     }
 
 
-@app.post("/api/add_document")
+@app.post("/api/add_document", status_code=202)
 async def add_document(document: Dict[str, Any]):
     """
-    Add a new document to the index
-    
+    Queue a new document for indexing
+
+    Documents are buffered and appended to the index in batches (every
+    FLUSH_MAX_DOCS documents or FLUSH_INTERVAL_SECONDS seconds).
+
     Args:
         document: Document data with 'docno' and 'text' fields
     """
     if not search_engine:
         raise HTTPException(status_code=500, detail="Search engine not initialized")
-    
+
     if 'docno' not in document or 'text' not in document:
         raise HTTPException(status_code=400, detail="Document must contain 'docno' and 'text' fields")
-    
+
     # Ensure raw_text exists for highlighting
     if 'raw_text' not in document:
         document['raw_text'] = document['text']
-    
-    # Add to index (this is a simplified approach - in a real app you might want to
-    # rebuild or update the index more efficiently)
-    search_engine.create_index([document])
-    
-    return {"status": "success", "message": "Document added successfully"}
 
+    with pending_lock:
+        pending_documents.append(document)
+        flush_now = len(pending_documents) >= FLUSH_MAX_DOCS
+    if flush_now:
+        try:
+            await flush_pending_documents()
+        except Exception:
+            # The batch is re-queued; the document is still accepted
+            logger.exception("Size-triggered document flush failed")
 
-@app.get("/health")
-async def health_check():
-    """
-    Health check endpoint
-    """
-    return {"status": "healthy", "message": "Job Search API is running"}
+    return {"status": "accepted", "message": "Document queued for indexing"}
 
 
 if __name__ == "__main__":
-    uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    if os.getenv("ENV", "prod") == "dev":
+        # Auto-reload forces a single worker; keep it for development only.
+        uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=True)
+    else:
+        # Default to one worker: each worker runs its own JVM and DB pool,
+        # and /api/set_model only switches the model on the worker that
+        # serves it. Raise WEB_CONCURRENCY only when that is acceptable
+        # and the container has the CPU/memory to match.
+        uvicorn.run(
+            "app:app",
+            host="0.0.0.0",
+            port=8000,
+            workers=int(os.getenv("WEB_CONCURRENCY", "1")),
+            loop="uvloop",
+            http="httptools",
+            access_log=False,
+        )
\ No newline at end of file
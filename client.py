@@ -0,0 +1,108 @@
+"""
+Command-line Client for the PyTerrier Search API
+This script provides a small CLI wrapper around the FastAPI endpoints.
+"""
+
+import argparse
+import concurrent.futures
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class SearchEngineClient:
+    def __init__(self, base_url="http://localhost:8000", timeout=5):
+        """Initialize the client with a pooled, keep-alive session."""
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        # One session for the client's lifetime: keep-alive reuses the
+        # TCP/TLS connection instead of handshaking per request
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=50)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def search(self, query, num_results=10):
+        """Search the index and return the results list."""
+        response = self.session.post(
+            f"{self.base_url}/api/search",
+            json={"query": query, "num_results": num_results},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def set_model(self, model):
+        """Set the retrieval model on the server."""
+        response = self.session.post(
+            f"{self.base_url}/api/set_model",
+            json={"model": model},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def get_info(self):
+        """Get index statistics from the server."""
+        response = self.session.get(f"{self.base_url}/api/info", timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def add_document(self, docno, text):
+        """Add a single document to the index."""
+        response = self.session.post(
+            f"{self.base_url}/api/add_document",
+            json={"docno": docno, "text": text},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def add_documents_bulk(self, documents, max_workers=8):
+        """
+        Add many documents concurrently over the pooled session.
+
+        Args:
+            documents: List of dicts with 'docno' and 'text' keys
+            max_workers: Number of concurrent requests
+        """
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = [
+                pool.submit(self.add_document, doc["docno"], doc["text"])
+                for doc in documents
+            ]
+            return [f.result() for f in futures]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PyTerrier Search API client")
+    parser.add_argument("--url", default="http://localhost:8000", help="API base URL")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    search_parser = subparsers.add_parser("search", help="Search for documents")
+    search_parser.add_argument("query")
+    search_parser.add_argument("--results", type=int, default=10)
+
+    model_parser = subparsers.add_parser("model", help="Set the retrieval model")
+    model_parser.add_argument("name", choices=["BM25", "TF_IDF", "DirichletLM"])
+
+    subparsers.add_parser("info", help="Show search engine info")
+
+    add_parser = subparsers.add_parser("add", help="Add a document to the index")
+    add_parser.add_argument("docno")
+    add_parser.add_argument("text")
+
+    args = parser.parse_args()
+    client = SearchEngineClient(base_url=args.url)
+
+    if args.command == "search":
+        print(client.search(args.query, num_results=args.results))
+    elif args.command == "model":
+        print(client.set_model(args.name))
+    elif args.command == "info":
+        print(client.get_info())
+    elif args.command == "add":
+        print(client.add_document(args.docno, args.text))
+
+
+if __name__ == "__main__":
+    main()
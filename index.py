@@ -6,65 +6,201 @@ This script extends the basic search engine with additional features:
 - Custom preprocessing
 - Search results highlighting
 """
+import fcntl
+import hashlib
 import os
 import re
-import json
+import orjson
 import pandas as pd
+import polars as pl
+import pyarrow.csv as pacsv
 import pyterrier as pt
+from cachetools import LRUCache
 from tqdm import tqdm
-from sqlalchemy import text
+from sqlalchemy import ARRAY, BigInteger, bindparam, text
 
 # Initialize PyTerrier
 if not pt.started():
     pt.init()
 
+# Fallback sentence pattern; the hot path uses plain str.split('.')
+_SENT_RE = re.compile(r'[^.]+(?:\.)?')
+
+# Module-level statements so SQLAlchemy caches the compiled form
+_FETCH_COLUMNS = 'job_id, job_title, company, location, salary_range'
+
+_LIST_STMT = text(f"""
+    SELECT {_FETCH_COLUMNS} FROM job_listings
+    LIMIT 20
+""")
+
+# array_position keeps the rows in the caller's (BM25 score) order
+# without a Python-side re-sort
+_FETCH_STMT = text(f"""
+    SELECT {_FETCH_COLUMNS} FROM job_listings
+    WHERE "job_id" = ANY(:ids)
+    ORDER BY array_position(:ids, job_id)
+""").bindparams(bindparam("ids", type_=ARRAY(BigInteger)))
+
+def _as_bigint(doc_id):
+    """Return doc_id as an int when it fits a Postgres bigint, else None."""
+    try:
+        value = int(doc_id)
+    except (TypeError, ValueError):
+        return None
+    return value if -(1 << 63) <= value < (1 << 63) else None
+
+def corpus_fingerprint(filepath):
+    """Compute a SHA256 fingerprint of a corpus file, reading in chunks."""
+    sha = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
 class SearchEngine:
-    def __init__(self, index_path="./index"):
-        """Initialize the search engine with a specified index path."""
+    def __init__(self, index_path="./index", engine=None):
+        """
+        Initialize the search engine with a specified index path.
+
+        Args:
+            index_path: Directory holding the Terrier index
+            engine: Optional SQLAlchemy engine reused by all fetches
+        """
         self.index_path = os.path.abspath(index_path)
+        self.engine = engine
+        # Added documents live in a side (delta) index rebuilt from a
+        # persisted log, since Terrier cannot append to an existing index
+        self.delta_path = self.index_path + "_delta"
+        self._delta_log_path = self.index_path + "_delta_docs.jsonl"
+        self.delta_index = None
+        # docno -> text for delta documents, used to back-fill display
+        # rows since they have no job_listings row
+        self._delta_docs = {}
         self.index = None
         self.indexer = None
         self.retrieval_model = None
+        self.model_name = "BM25"
+        self._retrievers = {}
+        # Ranked results keyed by (model, normalized query, k); a hit
+        # skips the Terrier JVM bridge entirely
+        self._results_cache = LRUCache(maxsize=1024)
+        # (key, result) of the immediately preceding search() call
+        self._last = None
     
-    def create_index(self, df):
+    def create_index(self, df, fingerprint=None):
         """
         Create an index from a list of documents.
-        
+
         Args:
             documents: List of dictionaries with 'docno' (document ID) and 'text' (document content) keys
+            fingerprint: Optional corpus fingerprint; when it matches the one
+                stored next to the index, the existing index is loaded instead
+                of rebuilding
         """
-        index_df = df.copy()        
-        index_df['docno'] = index_df['Job Id'].astype(str)
-        
-        # Concatenate all the text columns to index
-        text_columns = list(index_df.columns)
-        text_columns.remove('docno')
-        
-        index_df['text'] = index_df[text_columns].apply(
-            lambda row: ' '.join(str(val) for val in row if pd.notna(val)), axis=1
+        fingerprint_path = os.path.join(self.index_path, "fingerprint.txt")
+        if fingerprint is not None and os.path.exists(fingerprint_path):
+            with open(fingerprint_path) as f:
+                if f.read().strip() == fingerprint:
+                    print("Corpus unchanged, loading existing index")
+                    self.documents_df = df.set_index('Job Id', drop=False)
+                    self.load_index()
+                    return
+
+        # Polars does the docno cast and text concatenation columnar and
+        # parallel across cores, without pandas' per-cell object boxing
+        index_df = pl.from_pandas(df).with_columns(
+            pl.col('Job Id').cast(pl.Utf8).alias('docno')
         )
-        index_df = index_df[['docno', 'text']]
-        
+        text_columns = [col for col in index_df.columns if col != 'docno']
+        index_df = index_df.with_columns(
+            pl.concat_str(
+                [pl.col(col).fill_null('').cast(pl.Utf8) for col in text_columns],
+                separator=' ',
+            ).alias('text')
+        ).select(['docno', 'text'])
+
         # Indexing Part
         os.makedirs(self.index_path, exist_ok=True)
         self.indexer = pt.IterDictIndexer(self.index_path, overwrite=True)
-        
-        docs = index_df.to_dict(orient='records')
-        with tqdm(total=len(docs), desc="Indexing documents") as pbar:
-            def index_with_progress(docs):
-                for doc in docs:
-                    yield doc
-                    pbar.update(1)
-            
-            self.indexer.index(index_with_progress(docs))        
-        self.documents_df = df
+
+        # Stream documents into the indexer instead of materializing the
+        # whole corpus as a list of dicts; the progress bar ticks once per
+        # 1000 docs rather than adding a Python call per document
+        def doc_stream(pbar, every=1000):
+            count = 0
+            for doc in index_df.iter_rows(named=True):
+                yield doc
+                count += 1
+                if count % every == 0:
+                    pbar.update(every)
+            pbar.update(count % every)
+
+        with tqdm(total=len(index_df), desc="Indexing documents") as pbar:
+            self.indexer.index(doc_stream(pbar))
+        # Index by Job Id so per-document lookups are O(k) hash probes
+        # instead of boolean-mask scans over the whole frame
+        self.documents_df = df.set_index('Job Id', drop=False)
         self.index = pt.IndexFactory.of(self.index_path)
+        self._retrievers.clear()
+        self._results_cache.clear()
+        self._last = None
+
+        if fingerprint is not None:
+            with open(fingerprint_path, 'w') as f:
+                f.write(fingerprint)
         
+    def index_documents(self, documents):
+        """
+        Add a batch of documents via the delta index.
+
+        Terrier's classic indexer cannot append to an existing index, so
+        documents are appended to a JSONL log next to the main index and a
+        small delta index is rebuilt from the full log; searches merge the
+        main and delta rankings. The log append and rebuild hold an
+        exclusive file lock, so concurrent flushes (several workers) are
+        serialized, and rebuilding from the shared log folds in documents
+        added by other processes.
+
+        Args:
+            documents: List of dicts with 'docno' and 'text' keys
+        """
+        with open(self._delta_log_path, 'ab') as log:
+            fcntl.flock(log, fcntl.LOCK_EX)
+            try:
+                for doc in documents:
+                    log.write(orjson.dumps({'docno': doc['docno'], 'text': doc['text']}) + b'\n')
+                log.flush()
+
+                with open(self._delta_log_path, 'rb') as f:
+                    delta_docs = [orjson.loads(line) for line in f if line.strip()]
+                indexer = pt.IterDictIndexer(self.delta_path, overwrite=True)
+                indexer.index(iter(delta_docs))
+            finally:
+                fcntl.flock(log, fcntl.LOCK_UN)
+
+        self.delta_index = pt.IndexFactory.of(self.delta_path, memory=False)
+        self._delta_docs = {str(doc['docno']): doc['text'] for doc in delta_docs}
+        self._retrievers.clear()
+        self._results_cache.clear()
+        self._last = None
+
     def load_index(self):
         """Load an existing index."""
         if os.path.exists(self.index_path):
-            self.index = pt.IndexFactory.of(self.index_path)
+            # memory=False keeps the index structures memory-mapped so all
+            # uvicorn workers share the OS page cache instead of each
+            # loading a private heap copy
+            self.index = pt.IndexFactory.of(self.index_path, memory=False)
             print(f"Index loaded with {self.index.getCollectionStatistics().numberOfDocuments} documents")
+            if os.path.exists(self.delta_path):
+                self.delta_index = pt.IndexFactory.of(self.delta_path, memory=False)
+                if os.path.exists(self._delta_log_path):
+                    with open(self._delta_log_path, 'rb') as f:
+                        self._delta_docs = {
+                            str(doc['docno']): doc['text']
+                            for doc in (orjson.loads(line) for line in f if line.strip())
+                        }
             return False
         else:
             print("No index found at specified path.")
@@ -81,69 +217,110 @@ class SearchEngine:
             print("Please create or load an index first.")
             return
         
-        if model_name == "TF_IDF":
-            self.retrieval_model = pt.BatchRetrieve(self.index, wmodel="TF_IDF")
-        elif model_name == "DirichletLM":
-            self.retrieval_model = pt.BatchRetrieve(self.index, wmodel="DirichletLM")
-        else:
-            self.retrieval_model = pt.BatchRetrieve(self.index, wmodel="BM25")
-            
+        if model_name not in ("TF_IDF", "DirichletLM"):
+            model_name = "BM25"
+
+        self.model_name = model_name
+        self.retrieval_model = self._get_retriever(model_name)
+
         print(f"Retrieval model set to {model_name}")
 
+    def _get_retriever(self, model_name, num_results=None, delta=False):
+        """
+        Return a cached BatchRetrieve for (model, k, index).
+
+        Passing num_results to Terrier makes its top-k heap do the cutoff
+        JVM-side, so only k rows cross the Py4J boundary.
+        """
+        key = (model_name, num_results, delta)
+        if key not in self._retrievers:
+            index = self.delta_index if delta else self.index
+            kwargs = {} if num_results is None else {"num_results": num_results}
+            self._retrievers[key] = pt.BatchRetrieve(index, wmodel=model_name, **kwargs)
+        return self._retrievers[key]
+
+    def _transform(self, query_df, num_results):
+        """Rank query_df against the main index merged with the delta index."""
+        results = self._get_retriever(self.model_name, num_results).transform(query_df)
+        if self.delta_index is not None:
+            delta = self._get_retriever(self.model_name, num_results, delta=True).transform(query_df)
+            if len(delta) > 0:
+                merged = pd.concat([results, delta], ignore_index=True)
+                merged = merged.sort_values('score', ascending=False)
+                if 'docno' in merged.columns:
+                    merged = merged.drop_duplicates(subset=['qid', 'docno'])
+                results = merged.groupby('qid', sort=False).head(num_results)
+        return results
+
+    def _delta_row(self, doc_id):
+        """
+        Display row for a delta-indexed document, or None.
+
+        Delta documents have no job_listings row, so the title is filled
+        from the logged text (trimmed to the job_title VARCHAR(100) width)
+        and the remaining display fields are left empty.
+        """
+        doc_text = self._delta_docs.get(str(doc_id))
+        if doc_text is None:
+            return None
+        return {
+            'job_id': str(doc_id),
+            'job_title': doc_text[:100],
+            'company': None,
+            'location': None,
+            'salary_range': None,
+        }
+
     def parse_job_fields(self, row: dict) -> dict:
-        row["benefits"] = json.loads(row["benefits"])
-        row["responsibilities"] = re.findall(r'[^.]+(?:\.)?', row["responsibilities"])
+        row["benefits"] = orjson.loads(row["benefits"])
+        row["responsibilities"] = [
+            s.strip() for s in row["responsibilities"].split('.') if s.strip()
+        ]
         return row
 
-    def fetch_documents(self, engine, doc_ids=None):
+    def fetch_documents(self, engine=None, doc_ids=None):
         """
         Fetch documents from the PostgreSQL database using a list of doc IDs.
-        
+
         Args:
-            engine: SQLAlchemy engine
+            engine: SQLAlchemy engine (defaults to the one given at init)
             doc_ids: List of document IDs (as strings or ints)
-            
+
         Returns:
-            DataFrame with rows from the job_listings table
+            List of row dicts from the job_listings table
         """
-        if doc_ids==None:
-            # generic
-            query = text(f"""
-                SELECT job_id, job_title, company, location, salary_range FROM job_listings
-                LIMIT 20
-            """)
-
+        engine = engine if engine is not None else self.engine
+        if doc_ids is None:
+            # generic listing used by /api/jobs
             with engine.connect() as conn:
-                result = conn.execute(query)
-                rows = result.mappings().all()
-                return [dict(row) for row in rows]
-        else:
-            # specific
-            param_names = [f"id{i}" for i in range(len(doc_ids))]
-            placeholders = ", ".join([f":{name}" for name in param_names])
-            query = text(f"""
-                SELECT job_id, job_title, company, location, salary_range FROM job_listings
-                WHERE "job_id" IN ({placeholders})
-            """)
+                return [dict(row) for row in conn.execute(_LIST_STMT).mappings()]
 
-            params = {f"id{i}": doc_id for i, doc_id in enumerate(doc_ids)}
+        if not doc_ids:
+            return []
 
-            with engine.connect() as conn:
-                result = conn.execute(query, params)
-                rows = result.mappings().all()
-                return [dict(row) for row in rows]
+        # A single ANY(:ids) array parameter keeps one cached plan in
+        # Postgres regardless of how many ids are requested. Documents
+        # added at runtime may carry arbitrary string docnos that cannot
+        # be bound to the bigint array, so those are skipped here
+        ids = [i for i in (_as_bigint(doc_id) for doc_id in doc_ids) if i is not None]
+        if not ids:
+            return []
+        params = {"ids": ids}
+        with engine.connect() as conn:
+            return [dict(row) for row in conn.execute(_FETCH_STMT, params).mappings()]
         
-    def fetch_details(self, engine, doc_id):
+    def fetch_details(self, engine=None, doc_id=None):
         """
         Fetch detail from 1 of the documents from the PostgreSQL database using a doc IDs.
         
         Args:
-            engine: SQLAlchemy engine
+            engine: SQLAlchemy engine (defaults to the one given at init)
             doc_id: List of document ID (as string)
-            
+
         Returns:
             Dict
         """
+        engine = engine if engine is not None else self.engine
         if not doc_id:
             return []
 
@@ -169,38 +346,107 @@ class SearchEngine:
         """
         if self.retrieval_model is None:
             self.set_retrieval_model()
-            
-        query_df = pd.DataFrame([{"qid": "q1", "query": query}])        
-        results = self.retrieval_model.transform(query_df)        
-        print("Search result columns:", results.columns.tolist())
-        
-        # Limit results
-        if len(results) > num_results:
-            results = results.head(num_results)
-        
+
+        # Typeahead plus submit fires the same search back to back;
+        # short-circuit identical consecutive calls before any other work
+        last_key = (self.model_name, query, num_results, engine is not None)
+        if self._last is not None and self._last[0] == last_key:
+            return self._last[1]
+
+        cache_key = (self.model_name, query.strip().lower(), num_results)
+        results = self._results_cache.get(cache_key)
+        if results is None:
+            query_df = pd.DataFrame([{"qid": "q1", "query": query}])
+            # Terrier cuts the ranking to num_results before it crosses the
+            # JVM boundary, so no head() is needed here
+            results = self._transform(query_df, num_results)
+            self._results_cache[cache_key] = results
+
         if engine is not None:
-            if 'docno' not in results.columns and 'docid' in results.columns:
-                results = results.rename(columns={'docid': 'docno'})
-            
-            doc_ids = results['docno'].tolist()
-            results = self.fetch_documents(engine, doc_ids)
+            # Only the ranked ids leave pandas; the response rows come
+            # straight from the explicit column list in fetch_documents,
+            # with delta documents back-filled in their ranked position
+            id_col = 'docno' if 'docno' in results.columns else 'docid'
+            doc_ids = results[id_col].tolist()
+            rows = self.fetch_documents(engine, doc_ids)
+            by_id = {str(row['job_id']): row for row in rows}
+            results = [
+                row for row in (
+                    by_id.get(str(doc_id)) or self._delta_row(doc_id)
+                    for doc_id in doc_ids
+                ) if row is not None
+            ]
 
+        self._last = (last_key, results)
         return results
-    
+
+    def batch_search(self, queries, num_results=10, engine=None):
+        """
+        Search the index with several queries in one transform call.
+
+        Amortizes the Python<->JVM crossing and, when an engine is given,
+        fetches metadata for the union of ranked ids in a single query.
+
+        Args:
+            queries: List of query strings
+            num_results: Maximum number of results per query
+            engine: Optional SQLAlchemy engine for metadata rows
+
+        Returns:
+            One entry per query: a ranked DataFrame, or a list of row dicts
+            when an engine is supplied
+        """
+        if self.retrieval_model is None:
+            self.set_retrieval_model()
+
+        query_df = pd.DataFrame({
+            'qid': [f'q{i}' for i in range(len(queries))],
+            'query': queries,
+        })
+        results = self._transform(query_df, num_results)
+        groups = {qid: group for qid, group in results.groupby('qid', sort=False)}
+        ranked = [groups.get(f'q{i}', results.iloc[0:0]) for i in range(len(queries))]
+
+        if engine is None:
+            return ranked
+
+        id_col = 'docno' if 'docno' in results.columns else 'docid'
+        per_query_ids = [group[id_col].tolist() for group in ranked]
+        all_ids = list(dict.fromkeys(doc_id for ids in per_query_ids for doc_id in ids))
+        rows = self.fetch_documents(engine, all_ids) if all_ids else []
+        by_id = {str(row['job_id']): row for row in rows}
+        return [
+            [
+                row for row in (
+                    by_id.get(str(doc_id)) or self._delta_row(doc_id)
+                    for doc_id in ids
+                ) if row is not None
+            ]
+            for ids in per_query_ids
+        ]
+
 def start_indexing():
     print("Initializing job search engine...")
     search_engine = SearchEngine()
     
     # Use local documents
     print("Creating index from local documents...")
-    df = pd.read_csv('collection/job_descriptions_small.csv')
+    csv_path = 'collection/job_descriptions_small.csv'
+    fingerprint = corpus_fingerprint(csv_path)
 
     columns = ['Job Id', 'Experience', 'Qualifications', 'Salary Range', 'location',
-            'Country','Work Type', 'Company Size', 'Preference', 
+            'Country','Work Type', 'Company Size', 'Preference',
             'Job Title', 'Role', 'Job Description', 'Benefits',
             'skills', 'Responsibilities', 'Company', 'Company Profile']
-    df = df[columns]
-    search_engine.create_index(df)
+
+    # PyArrow parses blocks in parallel threads and only materializes the
+    # columns we index; to_pandas with ArrowDtype keeps the views zero-copy
+    table = pacsv.read_csv(
+        csv_path,
+        convert_options=pacsv.ConvertOptions(include_columns=columns)
+    )
+    df = table.to_pandas(types_mapper=pd.ArrowDtype)
+    search_engine.create_index(df, fingerprint=fingerprint)
 
 if __name__ == "__main__":
     print("Job Search Engine Indexing Process")
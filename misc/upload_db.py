@@ -1,9 +1,13 @@
 import pandas as pd
 import psycopg2
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
 from sqlalchemy import create_engine
 import ast
 from sqlalchemy import text
-import json
+import io
+import orjson
 from urllib.parse import quote_plus
 import time
 import sys
@@ -17,23 +21,24 @@ def format_json_string(json_str):
     if not json_str or pd.isna(json_str):
         return None
     try:
-        json.loads(json_str)
+        orjson.loads(json_str)
         return json_str
-    except:
+    except (orjson.JSONDecodeError, TypeError):
         try:
             dict_data = ast.literal_eval(json_str)
-            return json.dumps(dict_data)
-        except:
+            return orjson.dumps(dict_data).decode()
+        except (ValueError, SyntaxError):
             return None
 
-def format_benefits(benefits_str):
-    if not benefits_str or pd.isna(benefits_str):
-        return None
-    
-    if benefits_str.startswith('{') and benefits_str.endswith('}'):
-        items = benefits_str[1:-1].split(', ')
-        return json.dumps(items)
-    return benefits_str
+def format_benefits_column(benefits):
+    """Vectorized rewrite of '{a, b}' benefit strings to JSON arrays."""
+    mask = benefits.notna() & benefits.str.startswith('{') & benefits.str.endswith('}')
+    benefits = benefits.copy()
+    benefits[mask] = [
+        orjson.dumps(value[1:-1].split(', ')).decode()
+        for value in benefits[mask]
+    ]
+    return benefits
 
 db_params = {
     'database': os.getenv('DB_NAME'),
@@ -133,41 +138,110 @@ try:
         print(f"Error reading CSV file: {file_error}")
         sys.exit(1)
         
-    chunksize = 5000  
     total_rows = 0
-    total_file_rows = sum(1 for _ in open(csv_file_path)) - 1 
-    print(f"Total rows in CSV: {total_file_rows}")
+    # Estimate the row count from a 64 KB sample instead of reading and
+    # decoding the whole file before the import even starts
+    file_size = os.path.getsize(csv_file_path)
+    with open(csv_file_path, 'rb') as f:
+        sample = f.read(1 << 16)
+    avg_line_length = len(sample) / max(1, sample.count(b'\n'))
+    total_file_rows = max(1, int(file_size / avg_line_length) - 1)
+    print(f"Estimated rows in CSV: {total_file_rows}")
     
     start_time = time.time()
-    
-    for chunk_index, chunk in enumerate(pd.read_csv(csv_file_path, chunksize=chunksize)):
-        chunk_start = time.time()
-        if chunk_index < 170:
-            continue
-        if chunk_index > 250:
+
+    # PyArrow's CSV reader parses blocks in parallel threads and hands
+    # back record batches without going through pandas' parser
+    reader = pacsv.open_csv(
+        csv_file_path,
+        read_options=pacsv.ReadOptions(block_size=1 << 23)
+    )
+
+    def _cast_column(table, name, caster):
+        index = table.schema.get_field_index(name)
+        return table.set_column(index, name, caster(table.column(name)))
+
+    # Resume window from the earlier partial import, in row offsets
+    # (the previous run processed 5000-row chunks 170..250)
+    RESUME_START_ROW = 850_000
+    RESUME_STOP_ROW = 1_255_000
+
+    rows_seen = 0
+    for chunk_index, batch in enumerate(reader):
+        batch_start_row = rows_seen
+        rows_seen += batch.num_rows
+        if batch_start_row >= RESUME_STOP_ROW:
             break
+        # Trim the batch to the window before doing any conversion work
+        offset = max(0, RESUME_START_ROW - batch_start_row)
+        length = min(batch.num_rows, RESUME_STOP_ROW - batch_start_row) - offset
+        if length <= 0:
+            continue
+        if offset or length < batch.num_rows:
+            batch = batch.slice(offset, length)
+
+        # Type conversions run as Arrow compute kernels (C++) before the
+        # batch is handed to pandas
+        table = pa.Table.from_batches([batch])
+        table = _cast_column(
+            table, 'Job Posting Date',
+            lambda col: pc.strptime(pc.cast(col, pa.string()), format='%Y-%m-%d',
+                                    unit='s', error_is_null=True)
+        )
+        for numeric_col in ('latitude', 'longitude', 'Company Size'):
+            table = _cast_column(
+                table, numeric_col,
+                lambda col: pc.cast(col, pa.float64(), safe=False)
+            )
+        chunk = table.to_pandas()
+        chunk_start = time.time()
         print(f"\nProcessing chunk {chunk_index+1}...")
         
         # Clean up data
         print("Formatting JSON and Benefits columns...")
-        chunk['Company Profile'] = chunk['Company Profile'].apply(format_json_string)
-        chunk['Benefits'] = chunk['Benefits'].apply(format_benefits)
-        
-        print("Converting data types...")
-        chunk['Job Posting Date'] = pd.to_datetime(chunk['Job Posting Date'], errors='coerce')
-        chunk['latitude'] = pd.to_numeric(chunk['latitude'], errors='coerce')
-        chunk['longitude'] = pd.to_numeric(chunk['longitude'], errors='coerce')
-        chunk['Company Size'] = pd.to_numeric(chunk['Company Size'], errors='coerce')
-        chunk = chunk.drop_duplicates(subset=['Job Id'])
+        chunk['Company Profile'] = [format_json_string(v) for v in chunk['Company Profile']]
+        chunk['Benefits'] = format_benefits_column(chunk['Benefits'])
         
         chunk.columns = [col.lower().replace(" ", "_") for col in chunk.columns]
-        
-        # Write to PostgreSQL
+
+        # company_size is INTEGER in Postgres; the float64 cast above would
+        # serialize values as "68608.0", which int4in rejects during COPY
+        chunk['company_size'] = chunk['company_size'].round().astype('Int64')
+
+        # Write to PostgreSQL via COPY: streams tuples straight into heap
+        # pages instead of parsing/planning INSERT statements per batch
         print(f"Writing {len(chunk)} rows to database...")
         try:
-            chunk.to_sql('job_listings', engine, if_exists='append', index=False, 
-                        method='multi', chunksize=500)
-            
+            buf = io.StringIO()
+            chunk.to_csv(buf, index=False, header=False, na_rep='\\N')
+            buf.seek(0)
+
+            columns = ', '.join(f'"{col}"' for col in chunk.columns)
+            raw_conn = engine.raw_connection()
+            try:
+                with raw_conn.cursor() as cursor:
+                    # COPY into a staging table, then upsert: duplicate
+                    # job_ids (within or across chunks) are dropped by
+                    # ON CONFLICT instead of a pandas drop_duplicates pass
+                    cursor.execute(
+                        "CREATE TEMP TABLE IF NOT EXISTS job_listings_stage "
+                        "(LIKE job_listings INCLUDING DEFAULTS)"
+                    )
+                    cursor.execute("TRUNCATE job_listings_stage")
+                    cursor.copy_expert(
+                        f"COPY job_listings_stage ({columns}) FROM STDIN WITH (FORMAT CSV, NULL '\\N')",
+                        buf
+                    )
+                    cursor.execute(
+                        f"INSERT INTO job_listings ({columns}) "
+                        f"SELECT {columns} FROM job_listings_stage "
+                        f"ON CONFLICT (job_id) DO NOTHING"
+                    )
+                raw_conn.commit()
+            finally:
+                raw_conn.close()
+
+
             total_rows += len(chunk)
             elapsed = time.time() - start_time
             chunk_time = time.time() - chunk_start
@@ -1,58 +1,165 @@
-import re
-import autocomplete
-
-class QueryAutoCompletion():
-    def __init__(self, filepath=None):
-        """
-        Initializes QAC class
-        """
-            
-    def load_model(self, pickle_filepath:str=None) -> None:
-        """
-        Load dictionary
-        
-        parameters:
-        - pickle_filepath (str): filepath to pickle
-        
-        returns: None
-        """
-        if pickle_filepath == None:
-            autocomplete.load()
-        else:
-            autocomplete.models.load_models(pickle_filepath)
-        
-    def get_suggestions(self, query: str, limit:int=5) -> list[str]:
-        """
-        Function 
-        
-        parameters:
-        - query (str): query passed from the frontend
-        - limit (int): maximum suggestions
-        
-        returns:
-        query suggestions (list[str])
-        """
-        tokens = re.split(r'\W+', query)
-            
-        if len(tokens) > 0:
-            try:
-                predictions = autocomplete.predict(tokens[-2], tokens[-1], limit)
-                if len(predictions < limit):
-                    predictions.extend(autocomplete.predict(tokens[-1], '', limit))
-            except:
-                predictions = autocomplete.predict(tokens[-1], '', limit)
-            
-            predictions = [query + suggestion[len(tokens[-1]):] 
-                           for suggestion, _ in predictions]
-            return predictions[:limit]
-
-def main():
-    qac = QueryAutoCompletion()
-    qac.load_model("qac.pkl")
-    
-    while True:
-        query = input("Search for: ")
-        print(qac.get_suggestions(query, 7))
-
-if __name__ == "__main__":
-    main()
\ No newline at end of file
+import bisect
+import functools
+import heapq
+import os
+import re
+import autocomplete
+import numpy as np
+
+try:
+    import marisa_trie
+except ImportError:
+    marisa_trie = None
+
+_SPLIT_RE = re.compile(r'\W+')
+
+# Suggestions only ever use the tail of the query, so bound the regex scan
+_MAX_SCAN_CHARS = 64
+
+# Separator between the previous word and the completion prefix in the
+# bigram trie keys
+_BIGRAM_SEP = '\x1f'
+
+class QueryAutoCompletion():
+    def __init__(self, filepath=None):
+        """
+        Initializes QAC class
+        """
+        self.trie = None
+        self.frequencies = None
+        self.bigram_trie = None
+        self.bigram_frequencies = None
+        self.terms = None
+        self.term_freq = None
+        # As the user types one more character the previous prefixes
+        # repeat, so memoize completed prefixes per instance
+        self._complete = functools.lru_cache(maxsize=4096)(self._complete_uncached)
+
+    def load_model(self, pickle_filepath:str=None) -> None:
+        """
+        Load the prefix trie, building it from the pickle if needed
+
+        The trie and frequency array are persisted next to the pickle
+        (.marisa / .freq.npy) and mmap-loaded, so startup skips the
+        unpickle and forked uvicorn workers share one read-only mapping.
+
+        parameters:
+        - pickle_filepath (str): filepath to pickle
+
+        returns: None
+        """
+        base = os.path.splitext(pickle_filepath or "qac.pkl")[0]
+        trie_path = base + ".marisa"
+        freq_path = base + ".freq.npy"
+        bigram_trie_path = base + ".bigram.marisa"
+        bigram_freq_path = base + ".bigram.freq.npy"
+
+        artifacts = (trie_path, freq_path, bigram_trie_path, bigram_freq_path)
+        if marisa_trie is not None and all(os.path.exists(p) for p in artifacts):
+            self.trie = marisa_trie.Trie()
+            self.trie.mmap(trie_path)
+            self.frequencies = np.load(freq_path, mmap_mode='r')
+            self.bigram_trie = marisa_trie.Trie()
+            self.bigram_trie.mmap(bigram_trie_path)
+            self.bigram_frequencies = np.load(bigram_freq_path, mmap_mode='r')
+            return
+
+        if pickle_filepath == None:
+            autocomplete.load()
+        else:
+            autocomplete.models.load_models(pickle_filepath)
+
+        # Back suggestions with a succinct trie over the model vocabulary:
+        # prefix lookup is O(|prefix|) regardless of vocabulary size, and a
+        # flat frequency array indexed by trie id gives O(1) ranking.
+        words_model = autocomplete.models.WORDS_MODEL
+        if marisa_trie is not None:
+            self.trie = marisa_trie.Trie(list(words_model))
+            frequencies = np.zeros(len(self.trie), dtype='uint32')
+            for word, count in words_model.items():
+                frequencies[self.trie[word]] = count
+
+            self.trie.save(trie_path)
+            np.save(freq_path, frequencies)
+            self.frequencies = frequencies
+
+            # Context-aware completions: one trie over "prev\x1fnext" keys
+            # so (previous word, prefix) lookups stay O(|prefix|)
+            tuples_model = autocomplete.models.WORD_TUPLES_MODEL
+            self.bigram_trie = marisa_trie.Trie([
+                prev + _BIGRAM_SEP + word
+                for prev, continuations in tuples_model.items()
+                for word in continuations
+            ])
+            bigram_frequencies = np.zeros(len(self.bigram_trie), dtype='uint32')
+            for prev, continuations in tuples_model.items():
+                for word, count in continuations.items():
+                    bigram_frequencies[self.bigram_trie[prev + _BIGRAM_SEP + word]] = count
+
+            self.bigram_trie.save(bigram_trie_path)
+            np.save(bigram_freq_path, bigram_frequencies)
+            self.bigram_frequencies = bigram_frequencies
+        else:
+            # Fallback without marisa-trie: bisect over a sorted term list
+            # gives trie-like prefix lookup entirely in C
+            self.terms = sorted(words_model)
+            self.term_freq = dict(words_model)
+
+    def get_suggestions(self, query: str, limit:int=5) -> list[str]:
+        """
+        Complete the last token of the query from the prefix trie
+
+        parameters:
+        - query (str): query passed from the frontend
+        - limit (int): maximum suggestions
+
+        returns:
+        query suggestions (list[str])
+        """
+        tokens = _SPLIT_RE.split(query[-_MAX_SCAN_CHARS:])
+
+        if len(tokens) == 0 or not tokens[-1]:
+            return []
+
+        prefix = tokens[-1].lower()
+        prev = tokens[-2].lower() if len(tokens) >= 2 and tokens[-2] else ''
+        completions = self._complete(prev, prefix, limit)
+        return [query + word[len(prefix):] for word in completions]
+
+    def _complete_uncached(self, prev, prefix, limit):
+        """Rank the top completions for a lowercased (prev word, prefix)."""
+        completions = []
+        if prev and self.bigram_trie is not None:
+            # Prefer completions seen after the previous word
+            candidates = self.bigram_trie.keys(prev + _BIGRAM_SEP + prefix)
+            ranked = heapq.nlargest(
+                limit, candidates,
+                key=lambda key: self.bigram_frequencies[self.bigram_trie[key]]
+            )
+            completions = [key.split(_BIGRAM_SEP, 1)[1] for key in ranked]
+            if len(completions) >= limit:
+                return completions
+
+        if self.trie is not None:
+            candidates = self.trie.keys(prefix)
+            unigram = heapq.nlargest(
+                limit, candidates, key=lambda word: self.frequencies[self.trie[word]]
+            )
+        else:
+            lo = bisect.bisect_left(self.terms, prefix)
+            hi = bisect.bisect_left(self.terms, prefix + '\uffff')
+            unigram = heapq.nlargest(limit, self.terms[lo:hi], key=self.term_freq.get)
+
+        completions += [w for w in unigram if w not in completions]
+        return completions[:limit]
+
+def main():
+    qac = QueryAutoCompletion()
+    qac.load_model("qac.pkl")
+
+    while True:
+        query = input("Search for: ")
+        print(qac.get_suggestions(query, 7))
+
+if __name__ == "__main__":
+    main()
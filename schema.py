@@ -1,11 +1,13 @@
 from datetime import date
 from typing import Dict, List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class SearchQuery(BaseModel):
     query: str
-    num_results: int = 10
+    # Bounded: num_results keys a per-k retriever cache and is passed to
+    # Terrier, so arbitrary client values must not reach either
+    num_results: int = Field(10, ge=1, le=1000)
 
 class ModelConfig(BaseModel):
     model: str